@@ -1,10 +1,11 @@
 
 import os
 import glob
+import time
 from PySide6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog, QTreeWidgetItem
 from PySide6.QtCore import Qt
 
-from .parser import DemHeaderParseThread, DemoFileParser, CACHE_FOLDER, demoDataCache
+from .parser import DemHeaderParseThread, DemoFileParser, CACHE_FOLDER, demoDataCache, radarImageCache
 
 class DemoViewerActions:
     """
@@ -15,22 +16,19 @@ class DemoViewerActions:
     @staticmethod
     def clear_cache(parent):
         """
-        Clear both disk and memory cache for demo files.
+        Clear the demo data cache.
         Args:
             parent: The parent widget for displaying dialogs
         """
         try:
-            # Remove all files in CACHE_FOLDER
-            for f in glob.glob(os.path.join(CACHE_FOLDER, "*")):
+            # Remove pickle files left in CACHE_FOLDER by older versions
+            for f in glob.glob(os.path.join(CACHE_FOLDER, "demcache_*.pkl")):
                 try:
                     os.remove(f)
                 except Exception:
                     pass
-            # Clear in-memory cache
-            if hasattr(demoDataCache, "clear"):
-                demoDataCache.clear()
-            elif isinstance(demoDataCache, dict):
-                demoDataCache.clear()
+            demoDataCache.clear()
+            radarImageCache.clear()
             QMessageBox.information(parent, "Cache Cleared", "Demo cache has been cleared.")
         except Exception as e:
             QMessageBox.warning(parent, "Cache Error", f"Failed to clear cache:\n{e}")
@@ -48,8 +46,20 @@ class DemoViewerActions:
             load_map_cb: Callback to load a map (mname, addon)
             update_all_cb: Callback to update/rebuild all (footsteps, heatmap, info, selectors)
         """
-        paths, _ = QFileDialog.getOpenFileNames(
-            parent, "Open DEM Files", "", "DEM Files (*.dem);;All Files (*)")
+        # Qt's own dialog without symlink resolution or per-entry icon lookups,
+        # which can stall the native dialog on large folders and network mounts
+        dlg = QFileDialog(parent, "Open DEM Files")
+        dlg.setNameFilters(["DEM Files (*.dem)", "All Files (*)"])
+        dlg.setFileMode(QFileDialog.ExistingFiles)
+        dlg.setOptions(
+            QFileDialog.DontUseNativeDialog
+            | QFileDialog.DontResolveSymlinks
+            | QFileDialog.DontUseCustomDirectoryIcons
+            | QFileDialog.ReadOnly
+        )
+        if not dlg.exec():
+            return
+        paths = dlg.selectedFiles()
         if not paths:
             return
         prog = QProgressDialog("Parsing DEM files...", "Cancel", 0, len(paths), parent)
@@ -91,12 +101,19 @@ class DemoViewerActions:
             dem_tree.addTopLevelItem(dem_item)
             add_map_cb(mname)
 
+        last_label_time = [0.0]
+
         def on_info(fn, i, t, s):
-            lbl = f"Parsing {fn} ({i}/{t})"
+            prog.setValue(i)
+            # Relabelling re-lays out the dialog; keep it to ~10 Hz, but always show the last file
+            now = time.monotonic()
+            if now - last_label_time[0] < 0.1 and i != t:
+                return
+            last_label_time[0] = now
+            lbl = f"Parsed {fn} ({i}/{t})"
             if s:
                 lbl += f" [{s/1024:.1f} KB]"
             prog.setLabelText(lbl)
-            prog.setValue(i)
 
         def on_finish():
             prog.setValue(len(paths))
@@ -106,7 +123,7 @@ class DemoViewerActions:
         thread.file_parsed.connect(on_parsed)
         thread.current_info.connect(on_info)
         thread.finished.connect(on_finish)
-        prog.canceled.connect(lambda: thread.terminate())
+        prog.canceled.connect(thread.requestInterruption)
         thread.start()
         prog.exec()
         thread.wait()
@@ -1,7 +1,15 @@
 import winreg, os, re, vdf, subprocess, tempfile, vpk
 import sys
+from collections import namedtuple
+from functools import lru_cache
 
 from PySide6.QtGui import QImage
+
+# "path" entries in libraryfolders.vdf
+_LIBPATH_RE = re.compile(r'"path"\s+"([^"]+)"')
+
+
+@lru_cache(maxsize=1)
 def get_steam_install_path():
     """
     Retrieve the Steam installation path from the Windows Registry.
@@ -20,6 +28,7 @@ def get_steam_install_path():
             return None
 
 
+@lru_cache(maxsize=4)
 def get_steam_library_folders(steam_path):
     """
     Retrieve all Steam library folders from the libraryfolders.vdf file.
@@ -30,7 +39,7 @@ def get_steam_library_folders(steam_path):
     try:
         with open(vdf_path, "r") as f:
             content = f.read()
-            matches = re.findall(r'"path"\s+"([^"]+)"', content)
+            matches = _LIBPATH_RE.findall(content)
             library_folders.extend(matches)
     except Exception as e:
         print(f"Error reading libraryfolders.vdf: {e}")
@@ -50,6 +59,7 @@ def find_counter_strike_path(library_folders):
     return None
 
 
+@lru_cache(maxsize=1)
 def get_counter_strike_path_from_registry():
     """
     Main function to get the Counter-Strike installation path.
@@ -62,6 +72,7 @@ def get_counter_strike_path_from_registry():
     csgo_path = find_counter_strike_path(library_folders)
     return csgo_path
 
+@lru_cache(maxsize=1)
 def get_decompiler_path():
     path = os.path.join(os.path.dirname(__file__), 'external','Decompiler.exe')
     print(path)
@@ -71,26 +82,93 @@ def get_decompiler_path():
 
 
 
+# VPK entries with these extensions are stored in a directly usable format
+PLAIN_VPK_EXTENSIONS = (".txt", ".vdf", ".cfg", ".json", ".png", ".jpg")
+
+# vpk_path -> {lower-cased internal path: internal path}
+_VPK_LOWER_INDEX = {}
+
+# vpk_path -> opened vpk.VPK; the directory is parsed on first lookup and kept
+_VPK_HANDLES = {}
+
+# (vpk_path, internal_path, extra_args) -> extracted output path, for this session
+SESSION_RADAR_CACHE = {}
+
+
+def open_vpk(vpk_path):
+    """
+    Return a shared vpk.VPK handle for vpk_path, kept until invalidate_vpk_caches.
+    """
+    pak = _VPK_HANDLES.get(vpk_path)
+    if pak is None:
+        pak = vpk.open(vpk_path)
+        _VPK_HANDLES[vpk_path] = pak
+    return pak
+
+
+def _vpk_lower_index(vpk_path, pak):
+    """
+    Return a case-insensitive path index for the VPK, kept until invalidate_vpk_caches.
+    """
+    index = _VPK_LOWER_INDEX.get(vpk_path)
+    if index is None:
+        index = {fp.lower(): fp for fp in pak}
+        _VPK_LOWER_INDEX[vpk_path] = index
+    return index
+
+
+def invalidate_vpk_caches():
+    """
+    Forget every opened VPK, path index and extraction, after a VPK changed on disk.
+    The caches are not stat-checked on lookup; the radar loader's file watcher calls this.
+    """
+    _VPK_HANDLES.clear()
+    _VPK_LOWER_INDEX.clear()
+    SESSION_RADAR_CACHE.clear()
+
+
 def fetch_file_from_vpk(vpk_path, internal_path, temp_prefix="file_decompiled_", extra_args=None, timeout=30000):
     """
     Attempt to extract a file from a VPK archive. If found, run an external external tool.
     Return the final path to the extracted output.
+    Successful extractions are remembered in SESSION_RADAR_CACHE for the rest of the session.
     """
     if extra_args is None:
         extra_args = []
+    cache_key = (vpk_path, internal_path, tuple(extra_args))
+    cached = SESSION_RADAR_CACHE.get(cache_key)
+    if cached and os.path.isfile(cached):
+        return cached
+    result = _extract_file_from_vpk(vpk_path, internal_path, temp_prefix, extra_args, timeout)
+    if result:
+        SESSION_RADAR_CACHE[cache_key] = result
+    return result
+
+
+def _extract_file_from_vpk(vpk_path, internal_path, temp_prefix, extra_args, timeout):
     file_data = None
     try:
-        with vpk.open(vpk_path) as pak:
-            for fp in pak:
-                if fp.lower() == internal_path.lower():
-                    file_data = pak.get_file(fp).read()
-                    break
+        pak = open_vpk(vpk_path)
+        # Exact paths hit the directory dict directly; only a miss pays for the case-insensitive index
+        try:
+            file_data = pak.get_file(internal_path).read()
+        except KeyError:
+            real_path = _vpk_lower_index(vpk_path, pak).get(internal_path.lower())
+            if real_path:
+                file_data = pak.get_file(real_path).read()
     except:
         return None
 
     if not file_data:
         return None
 
+    # Plain files are usable as stored; only compiled resources need the decompiler
+    ext = os.path.splitext(internal_path)[1].lower()
+    if ext in PLAIN_VPK_EXTENSIONS:
+        with tempfile.NamedTemporaryFile(prefix=temp_prefix, suffix=ext, delete=False) as out:
+            out.write(file_data)
+        return out.name
+
     if not os.path.isfile(get_decompiler_path()):
         return None
 
@@ -120,6 +198,7 @@ def fetch_file_from_vpk(vpk_path, internal_path, temp_prefix="file_decompiled_",
     return outputs[0]
 
 
+@lru_cache(maxsize=1)
 def get_official_vpk_path():
     """Try reading the official Steam path for pak01_dir.vpk."""
     try:
@@ -163,15 +242,24 @@ def load_qimage_from_path(path_):
     return None
 
 
-def load_radar_info(data):
+# World position of the radar's top-left corner and world units per radar pixel
+RadarInfo = namedtuple("RadarInfo", "pos_x pos_y scale")
+DEFAULT_RADAR_INFO = RadarInfo(0.0, 0.0, 1.0)
+
+
+# "pos_x" "-2476" style entries of an overview config
+_RADAR_KEY_RE = re.compile(r'"(pos_x|pos_y|scale)"\s+"([^"]*)"', re.IGNORECASE)
+
+
+def parse_radar_info(text):
     """
-    Parse VDF config for the radar info. Return a dict with pos_x, pos_y, scale.
+    Pull pos_x, pos_y and scale straight out of overview config text, without a full VDF parse.
+    The first occurrence of each key wins, which is the map block's own value.
     """
-    if data and isinstance(data, dict):
-        map_key = list(data.keys())[0]
-        m_info = data[map_key]
-        px = float(m_info.get("pos_x", 0))
-        py = float(m_info.get("pos_y", 0))
-        sc = float(m_info.get("scale", 1)) or 1.0
-        print({"pos_x": px, "pos_y": py, "scale": sc})
-        return {"pos_x": px, "pos_y": py, "scale": sc}
+    found = {}
+    for key, value in _RADAR_KEY_RE.findall(text):
+        found.setdefault(key.lower(), value)
+    px = float(found.get("pos_x", 0))
+    py = float(found.get("pos_y", 0))
+    sc = float(found.get("scale", 1)) or 1.0
+    return RadarInfo(px, py, sc)
@@ -1,45 +1,178 @@
-def calc_heatmap_np(footsteps, w, h):
+from functools import lru_cache
+
+# Grids smaller than this many cells are blurred on the CPU; the transfers would dominate
+GPU_BLUR_MIN_CELLS = 256 * 256
+
+@lru_cache(maxsize=None)
+def _gpu_backend():
+    """
+    Return (cupy, cupyx gaussian_filter) if CuPy and a CUDA device are available, else None.
+    Probed on first use only, so launching does not pay for the CUDA driver setup.
+    """
+    try:
+        import cupy as cp
+        from cupyx.scipy.ndimage import gaussian_filter
+        if cp.cuda.runtime.getDeviceCount() < 1:
+            return None
+    except Exception:
+        # cupy missing, or installed without a usable driver/device
+        return None
+    return cp, gaussian_filter
+
+def calc_heatmap_np(fx, fy, w, h):
+    import numpy as np
+    if len(fx) == 0:
+        return np.zeros((h, w), dtype=np.float32)
+    flat, _ = heatmap_cell_indices(fx, fy, w, h)
+    return heatmap_from_cells(flat, w, h)
+
+def heatmap_cell_indices(fx, fy, w, h):
+    """
+    Round points to their nearest cell of a w x h grid.
+    Returns (flat, mask): the row-major index iy * w + ix of every point that lands
+    inside the grid, and the boolean mask of which input points those are.
+    """
     import numpy as np
-    heat = np.zeros((h, w), dtype=np.float32)
-    if not footsteps:
+    # Bounds-check before rounding so the narrow integer cast below cannot overflow
+    mask = (fx >= -0.5) & (fx < w - 0.5) & (fy >= -0.5) & (fy < h - 0.5)
+    idx_type = np.int16 if max(w, h) <= np.iinfo(np.int16).max else np.int32
+    # Round to nearest by truncating x + 0.5 (non-negative after the mask)
+    ix = (fx[mask] + 0.5).astype(idx_type)
+    iy = (fy[mask] + 0.5).astype(idx_type)
+    # float32 rounding can push x just below w - 0.5 up to exactly w
+    np.minimum(ix, w - 1, out=ix)
+    np.minimum(iy, h - 1, out=iy)
+    flat_type = np.int32 if w * h <= np.iinfo(np.int32).max else np.int64
+    flat = iy.astype(flat_type) * w + ix
+    return flat, mask
+
+def heatmap_from_cells(flat, w, h):
+    """
+    Count the flat cell indices from heatmap_cell_indices into a float32 h x w grid.
+    """
+    import numpy as np
+    return np.bincount(flat, minlength=w * h).reshape(h, w).astype(np.float32, copy=False)
+
+# Gaussian kernels are cut off at this many sigmas
+BLUR_TRUNCATE = 3.0
+# Above this sigma the blur runs as a multiplication in the frequency domain
+FFT_BLUR_MIN_SIGMA = 10.0
+
+def blur_heatmap(heat, sigma):
+    """
+    Gaussian-blur a heatmap grid with reflected edges, like scipy's gaussian_filter.
+    Large grids go to the GPU when CuPy and a CUDA device are available. On the
+    CPU, small sigmas use the separable direct filter; large ones use an FFT, whose
+    cost does not grow with the kernel size.
+    """
+    import numpy as np
+    if sigma <= 0 or heat.size == 0:
         return heat
-    arr = np.array(footsteps, dtype=np.float32)
-    ix = np.round(arr[:, 1]).astype(int)
-    iy = np.round(arr[:, 2]).astype(int)
-    mask = (ix >= 0) & (ix < w) & (iy >= 0) & (iy < h)
-    ix = ix[mask]
-    iy = iy[mask]
-    np.add.at(heat, (iy, ix), 1)
-    return heat
-
-def heatmap_to_qimage(
-    data, cmap="jet", gamma=1/3.0,
-    brightness=0.0, contrast=1.0
-):
+    gpu = _gpu_backend() if heat.size > GPU_BLUR_MIN_CELLS else None
+    if gpu is not None:
+        cp, gpu_gaussian_filter = gpu
+        try:
+            blurred = gpu_gaussian_filter(cp.asarray(heat, dtype=cp.float32), sigma,
+                                          mode="reflect", truncate=BLUR_TRUNCATE)
+            return cp.asnumpy(blurred)
+        except Exception:
+            # Out of device memory or a driver error: fall through to the CPU path
+            pass
+    if sigma <= FFT_BLUR_MIN_SIGMA:
+        from scipy.ndimage import gaussian_filter
+        return gaussian_filter(heat, sigma, mode="reflect", truncate=BLUR_TRUNCATE)
+    from scipy import fft
+    from scipy.ndimage import fourier_gaussian
+    # numpy's "symmetric" padding is scipy.ndimage's "reflect"
+    pad = int(BLUR_TRUNCATE * sigma + 0.5)
+    padded = np.pad(heat, pad, mode="symmetric")
+    spectrum = fourier_gaussian(fft.rfft2(padded, workers=-1), sigma, n=padded.shape[1])
+    blurred = fft.irfft2(spectrum, s=padded.shape, workers=-1)
+    return blurred[pad:-pad, pad:-pad].astype(np.float32)
+
+# Colormap names rendered straight to an 8-bit grayscale image
+GRAYSCALE_CMAPS = ("gray", "grey", None)
+
+# Colormap name -> (256, 4) uint8 RGBA lookup table
+_CMAP_LUTS = {}
+
+def colormap_lut(cmap):
+    """
+    Return the 256-entry RGBA uint8 lookup table for a matplotlib colormap.
+    Unknown colormap names fall back to "jet".
+    """
+    lut = _CMAP_LUTS.get(cmap)
+    if lut is None:
+        import numpy as np
+        from matplotlib import colormaps
+        try:
+            cmap_obj = colormaps.get_cmap(cmap)
+        except Exception:
+            cmap_obj = colormaps.get_cmap("jet")
+        lut = cmap_obj(np.linspace(0, 1, 256), bytes=True)
+        _CMAP_LUTS[cmap] = lut
+    return lut
+
+def normalize_heatmap(data, gamma=1/3.0):
+    """
+    Flip a heatmap into image row order, scale it to [0, 1], apply gamma and
+    quantize to 256 levels. Gamma is applied before quantizing so the low end,
+    which gamma < 1 stretches, keeps its resolution.
+    Returns a uint8 array that colorize_heatmap can recolor repeatedly.
+    """
     import numpy as np
-    from matplotlib import colormaps
-    from PySide6.QtGui import QImage
-    if data.size == 0:
-        return QImage(1, 1, QImage.Format_ARGB32_Premultiplied)
     data = np.flipud(data)
     vmax = data.max()
     vmin = data.min()
     if vmax > vmin:
-        norm = (data - vmin) / (vmax - vmin)
-        norm = norm ** gamma
-    else:
-        norm = np.zeros_like(data)
+        norm = np.subtract(data, vmin, dtype=np.float32)
+        norm *= np.float32(1.0 / (vmax - vmin))
+        np.power(norm, np.float32(gamma), out=norm)
+        norm *= 255
+        norm += 0.5
+        return norm.astype(np.uint8)
+    return np.zeros(data.shape, dtype=np.uint8)
 
-    norm = contrast * (norm - 0.5) + 0.5 + brightness
-    norm = np.clip(norm, 0, 1)
+@lru_cache(maxsize=16)
+def heatmap_lut(cmap="jet", brightness=0.0, contrast=1.0):
+    """
+    Return the 256-entry table mapping a heatmap level to its output pixel, with
+    contrast, brightness and the colormap folded in: (256, 4) uint8 RGBA, or
+    (256,) uint8 for grayscale colormaps. Cached; do not modify the result.
+    """
+    import numpy as np
+    # Integer contrast/brightness around mid-gray, contrast in 1/256 steps
+    level = np.arange(256, dtype=np.int32) - 128
+    level *= int(round(contrast * 256))
+    level >>= 8
+    level += 128 + int(round(brightness * 255))
+    np.clip(level, 0, 255, out=level)
+    if cmap in GRAYSCALE_CMAPS:
+        return level.astype(np.uint8)
+    # Same bin selection as matplotlib's float colormap call: int(level / 255 * 256), capped at 255
+    bins = np.minimum(level * 256 // 255, 255).astype(np.uint8)
+    lut = colormap_lut(cmap)[bins]
+    lut[:, 3] = level
+    return lut
 
-    try:
-        cmap_obj = colormaps.get_cmap(cmap)
-    except Exception:
-        cmap_obj = colormaps.get_cmap("jet")
-    rgba = cmap_obj(norm, bytes=True)
-    alpha = (norm * 255).astype(np.uint8)
-    rgba[..., 3] = alpha
-    h_, w_ = rgba.shape[:2]
-    qimg = QImage(rgba.data, w_, h_, rgba.strides[0], QImage.Format_RGBA8888)
-    return qimg.copy()
\ No newline at end of file
+def colorize_heatmap(levels, cmap="jet", brightness=0.0, contrast=1.0):
+    """
+    Apply contrast, brightness and a colormap to a heatmap from normalize_heatmap.
+    The levels are kept as an 8-bit indexed image and the lookup table becomes its
+    color table, so Qt expands the colors when drawing. The input array is left untouched.
+    """
+    import numpy as np
+    from PySide6.QtGui import QImage
+    if levels.size == 0:
+        return QImage(1, 1, QImage.Format_ARGB32_Premultiplied)
+    h_, w_ = levels.shape[:2]
+    levels = np.ascontiguousarray(levels)
+    qimg = QImage(levels.data, w_, h_, levels.strides[0], QImage.Format_Indexed8).copy()
+    lut = heatmap_lut(cmap, brightness, contrast).astype(np.uint32)
+    if lut.ndim == 1:
+        # Gray carries alpha = level like the colormaps do
+        argb = (lut << 24) | (lut << 16) | (lut << 8) | lut
+    else:
+        argb = (lut[:, 3] << 24) | (lut[:, 0] << 16) | (lut[:, 1] << 8) | lut[:, 2]
+    qimg.setColorTable(argb.tolist())
+    return qimg
@@ -1,14 +1,14 @@
 
 import os
 import sys
-import time
-import re
 import tempfile
 import pickle
+import hashlib
+import queue
+import threading
 import json
 import subprocess
 import numpy as np
-import pandas as pd
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -18,17 +18,14 @@ from PySide6.QtWidgets import (
     QPushButton, QGroupBox, QGraphicsPixmapItem, QComboBox, QSpinBox
 )
 from PySide6.QtGui import QIcon, QPixmap, QImage, QPainter, QAction
-from PySide6.QtCore import Qt, QRectF, Signal, Slot, QTimer, QThread
+from PySide6.QtCore import Qt, QRectF, Signal, Slot, QTimer, QThread, QThreadPool, QRunnable
 
 from demoparser2 import DemoParser
+from diskcache import Cache
 from .common import *
 import vpk
 import vdf
 
-from scipy.ndimage import gaussian_filter
-from matplotlib import colormaps
-import matplotlib.colors as colors
-
 from .widgets import (
     ZoomableGraphicsView,
     LabeledSliderSpinBox,
@@ -36,73 +33,134 @@ from .widgets import (
 )
 
 # --- Caching Setup ---
-try:
-    from PySide6.QtCore import QCache
-    demoDataCache = QCache(2_000_000_000)  # ~2GB
-except ImportError:
-    demoDataCache = {}
-
 CACHE_FOLDER = os.path.join(os.getcwd(), "dem_cache")
 os.makedirs(CACHE_FOLDER, exist_ok=True)
+# Bump when the layout of cached parser data changes
+CACHE_VERSION = 3
+
+# Disk-backed LRU cache of parsed demo data, keyed by (CACHE_VERSION, demo content hash).
+# Pickle protocol 5 (PEP 574) writes the footstep ndarrays as raw buffers.
+demoDataCache = Cache(
+    CACHE_FOLDER,
+    size_limit=2 * 1024 ** 3,
+    eviction_policy="least-recently-used",
+    disk_pickle_protocol=pickle.HIGHEST_PROTOCOL
+)
 
-SESSION_RADAR_CACHE = {}
 SESSION_TEMP_FOLDER = tempfile.mkdtemp(prefix="demoviewer_radars_")
 
+# Decoded radar PNGs, keyed by (VPK path, VPK mtime, radar path) and tagged with
+# "VPK path|radar path" so a new VPK version can drop the old decode; kept across sessions
+VTEX_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "vtex")
+radarImageCache = Cache(
+    VTEX_CACHE_FOLDER,
+    size_limit=256 * 1024 ** 2,
+    eviction_policy="least-recently-used",
+    tag_index=True
+)
+
 # --- Utility Functions ---
 
+TEAMS = ["CT", "T"]
+# Fixed integer code of each team; footstep team Categoricals use TEAMS as categories, so these are their codes
+TEAM_CODES = {team: code for code, team in enumerate(TEAMS)}
+
+# Upper-cased team identifiers (names or team numbers) -> CT/T
+_TEAM_MAP = {
+    'CT': 'CT', 'COUNTERTERRORIST': 'CT', 'COUNTER-TERRORIST': 'CT', '3': 'CT',
+    'T': 'T', 'TERRORIST': 'T', 'TERRORISTS': 'T', '2': 'T',
+}
+
 def normalize_team_name(team_name):
     """
     Normalize team names to consistent CT/T format.
     """
     if not team_name:
         return None
-    team_str = str(team_name).upper()
-    if team_str in ('CT', 'COUNTERTERRORIST', 'COUNTER-TERRORIST', '3'):
-        return 'CT'
-    if team_str in ('T', 'TERRORIST', 'TERRORISTS', '2'):
-        return 'T'
-    return None
-
-def external_cache_path(demo_path):
-    base = os.path.basename(demo_path)
-    safe_name = re.sub(r"[^a-zA-Z0-9_.-]+", "_", base)
-    return os.path.join(CACHE_FOLDER, f"demcache_{safe_name}.pkl")
-
-def check_cache_folder_size(max_size_bytes=2 * 1024 * 1024 * 1024):
+    return _TEAM_MAP.get(str(team_name).upper())
+
+def concat_footsteps(parts, step=1):
     """
-    Ensure the cache folder does not exceed max_size_bytes.
-    Removes oldest files if necessary.
+    Concatenate the footsteps of several demos, merging the player/team categories.
+    With step > 1 only every step-th footstep of the merged sequence is kept, count // step
+    in all; each part is sliced first, so only the kept samples are ever copied.
     """
-    total_size = 0
-    files = []
-    for root, _, fs in os.walk(CACHE_FOLDER):
-        for f in fs:
-            fp = os.path.join(root, f)
-            sz = os.path.getsize(fp)
-            total_size += sz
-            files.append((fp, sz))
-    if total_size > max_size_bytes:
-        files_sorted = sorted(files, key=lambda x: os.path.getmtime(x[0]))
-        for fp, sz in files_sorted:
-            if total_size <= max_size_bytes:
-                break
-            try:
-                os.remove(fp)
-                total_size -= sz
-            except Exception:
-                pass
+    parts = [part for part in parts if len(part["x"])]
+    if not parts:
+        return empty_footsteps()
+    step = max(1, int(step))
+    if step > 1:
+        limit = (sum(len(part["x"]) for part in parts) // step) * step
+        sliced, offset = [], 0
+        for part in parts:
+            count = len(part["x"])
+            # First index of this part that falls on the global stride
+            keep = slice((-offset) % step, max(0, min(count, limit - offset)), step)
+            sliced.append({field: values[keep] for field, values in part.items()})
+            offset += count
+        parts = [part for part in sliced if len(part["x"])]
+        if not parts:
+            return empty_footsteps()
+    if len(parts) == 1:
+        return parts[0]
+    from pandas.api.types import union_categoricals
+    return {
+        "tick": np.concatenate([part["tick"] for part in parts]),
+        "x": np.concatenate([part["x"] for part in parts]),
+        "y": np.concatenate([part["y"] for part in parts]),
+        "player": union_categoricals([part["player"] for part in parts], sort_categories=True),
+        "team": union_categoricals([part["team"] for part in parts])
+    }
+
+def _column_or(df, primary, fallback):
+    """
+    Vectorized `row.get(primary) or row.get(fallback)` over the rows of a DataFrame.
+    """
+    import pandas as pd
+    empty = pd.Series([None] * len(df), index=df.index, dtype=object)
+    first = df.get(primary, empty)
+    return first.where(first.notna() & first.astype(bool), df.get(fallback, empty))
+
+def empty_footsteps():
+    """
+    Return an empty footsteps structure: parallel arrays keyed by field name.
+    Parsed demos store "player" and "team" as pandas Categoricals.
+    """
+    return {
+        "tick": np.empty(0, dtype=np.int32),
+        "x": np.empty(0, dtype=np.float32),
+        "y": np.empty(0, dtype=np.float32),
+        "player": np.empty(0, dtype=object),
+        "team": np.empty(0, dtype=object)
+    }
+
+def demo_file_hash(demo_path, chunk_size=64 * 1024):
+    """
+    Identify a demo by content: BLAKE2b over its size plus the first and last chunk_size bytes.
+    Renamed copies share a key; different demos with the same name no longer collide.
+    """
+    size = os.path.getsize(demo_path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(size).encode())
+    with open(demo_path, "rb") as f:
+        h.update(f.read(chunk_size))
+        f.seek(max(size - chunk_size, 0))
+        h.update(f.read(chunk_size))
+    return h.hexdigest()
 
 # --- Main Parser Class ---
 
 class DemoFileParser:
     """
     Parses a CS2 demo file and extracts header, round info, player info, deaths, and footsteps.
+    Footsteps are stored as parallel NumPy arrays (see empty_footsteps).
     Stores most popular weapons and player deaths as DataFrames.
     """
     def __init__(self, path):
         self.file = os.path.abspath(path)
+        self.file_hash = demo_file_hash(self.file)
         self.header = {}
-        self.footsteps = []
+        self.footsteps = empty_footsteps()
         self.rounds = []
         self.players = set()
         self.player_teams = {}
@@ -110,57 +168,23 @@ class DemoFileParser:
         self.weapon_popularity = None  # DataFrame: weapon, count
         self._parse()
 
-    def _load_from_cache(self, cache_file):
-        try:
-            with open(cache_file, "rb") as f:
-                loaded_data = pickle.load(f)
-            self.header = loaded_data["header"]
-            self.footsteps = loaded_data["footsteps"]
-            self.rounds = loaded_data.get("rounds", [])
-            self.players = set(loaded_data.get("players", []))
-            self.player_teams = loaded_data.get("player_teams", {})
-            self.player_deaths = loaded_data.get("player_deaths", None)
-            self.weapon_popularity = loaded_data.get("weapon_popularity", None)
-            if not isinstance(demoDataCache, dict):
-                demoDataCache.insert(self.file, loaded_data, cost=len(self.footsteps))
-            else:
-                demoDataCache[self.file] = loaded_data
-            return True
-        except Exception:
-            return False
-
-    def _load_from_memory_cache(self):
-        if not isinstance(demoDataCache, dict):
-            if demoDataCache.contains(self.file):
-                cached = demoDataCache[self.file]
-                self.header = cached["header"]
-                self.footsteps = cached["footsteps"]
-                self.rounds = cached.get("rounds", [])
-                self.players = set(cached.get("players", []))
-                self.player_teams = cached.get("player_teams", {})
-                self.player_deaths = cached.get("player_deaths", None)
-                self.weapon_popularity = cached.get("weapon_popularity", None)
-                return True
-        else:
-            if self.file in demoDataCache:
-                cached = demoDataCache[self.file]
-                self.header = cached["header"]
-                self.footsteps = cached["footsteps"]
-                self.rounds = cached.get("rounds", [])
-                self.players = set(cached.get("players", []))
-                self.player_teams = cached.get("player_teams", {})
-                self.player_deaths = cached.get("player_deaths", None)
-                self.weapon_popularity = cached.get("weapon_popularity", None)
-                return True
-        return False
+    def _restore(self, data):
+        self.header = data["header"]
+        self.footsteps = data["footsteps"]
+        self.rounds = data.get("rounds", [])
+        self.players = set(data.get("players", []))
+        self.player_teams = data.get("player_teams", {})
+        self.player_deaths = data.get("player_deaths", None)
+        self.weapon_popularity = data.get("weapon_popularity", None)
 
     def _parse(self):
-        cache_file = external_cache_path(self.file)
-        # Try disk cache
-        if os.path.isfile(cache_file) and self._load_from_cache(cache_file):
-            return
-        # Try in-memory cache
-        if self._load_from_memory_cache():
+        # Deferred so app startup does not pay for pandas before a demo is opened
+        import pandas as pd
+
+        cache_key = (CACHE_VERSION, self.file_hash)
+        cached = demoDataCache.get(cache_key)
+        if cached is not None:
+            self._restore(cached)
             return
 
         parser = DemoParser(self.file)
@@ -170,54 +194,60 @@ class DemoFileParser:
         except Exception:
             self.header = {}
 
-        # --- Player Deaths and Weapons ---
+        # --- Player Deaths and Weapons (one pass over the demo) ---
         weapons_df = parser.parse_event(
             "player_death",
             player=["X", "Y"],
             other=["tick", "user_name", "attacker_name", "weapon", "total_rounds_played"]
         )
+        self.player_deaths = pd.DataFrame(columns=['user_name', 'X', 'Y'])
         if weapons_df is not None and not weapons_df.empty:
             weapons_df = weapons_df.rename(columns={"X": "user_X", "Y": "user_Y"})
             self.weapons = weapons_df.copy()
             weapon_counts = weapons_df['weapon'].value_counts().reset_index()
             weapon_counts.columns = ['weapon', 'count']
             self.weapon_popularity = weapon_counts
+            if 'user_X' in weapons_df.columns and 'user_Y' in weapons_df.columns:
+                deaths_df = weapons_df.rename(columns={'user_X': 'X', 'user_Y': 'Y'})
+                self.player_deaths = deaths_df[['user_name', 'X', 'Y']].dropna(subset=['X', 'Y'])
         else:
             self.weapons = pd.DataFrame()
             self.weapon_popularity = pd.DataFrame(columns=['weapon', 'count'])
 
-        # --- Player Deaths DataFrame ---
-        event_df = parser.parse_event("player_death", player=["X", "Y"], other=["total_rounds_played"])
-        self.player_deaths = pd.DataFrame(columns=['user_name', 'X', 'Y'])
-        if event_df is not None and not event_df.empty:
-            # Prefer 'user_X'/'user_Y', fallback to 'X'/'Y'
-            if 'user_X' in event_df.columns and 'user_Y' in event_df.columns:
-                deaths_df = event_df.rename(columns={'user_X': 'X', 'user_Y': 'Y'})
-                self.player_deaths = deaths_df[['user_name', 'X', 'Y']].dropna(subset=['X', 'Y'])
-            elif 'X' in event_df.columns and 'Y' in event_df.columns:
-                self.player_deaths = event_df[['user_name', 'X', 'Y']].dropna(subset=['X', 'Y'])
-
         # --- Footsteps, Players, Teams ---
         try:
             ticks_df = parser.parse_ticks(["X", "Y", "player", "team", "team_name", "name", "is_alive"])
         except Exception:
             ticks_df = None
 
-        self.footsteps = []
+        self.footsteps = empty_footsteps()
         if ticks_df is not None and not ticks_df.empty:
-            idx_array = ticks_df.index.values
-            x_array = ticks_df.get("X", pd.Series([None]*len(idx_array))).values
-            y_array = ticks_df.get("Y", pd.Series([None]*len(idx_array))).values
-            player_array = ticks_df.get("player", ticks_df.get("name", pd.Series([None]*len(idx_array)))).values
-            team_array = ticks_df.get("team", ticks_df.get("team_name", pd.Series([None]*len(idx_array)))).values
-            for ix, xx, yy, pname, tname in zip(idx_array, x_array, y_array, player_array, team_array):
-                if xx is not None and yy is not None:
-                    norm_team = normalize_team_name(tname)
-                    self.footsteps.append((ix, xx, yy, pname, norm_team))
-                    if pname:
-                        self.players.add(pname)
-                        if norm_team in ("CT", "T"):
-                            self.player_teams[pname] = norm_team
+            empty = pd.Series([None] * len(ticks_df), index=ticks_df.index)
+            steps_df = pd.DataFrame({
+                "tick": ticks_df.get("tick", pd.Series(ticks_df.index, index=ticks_df.index)),
+                "X": ticks_df.get("X", empty),
+                "Y": ticks_df.get("Y", empty),
+                "player": ticks_df.get("player", ticks_df.get("name", empty)),
+                "team": ticks_df.get("team", ticks_df.get("team_name", empty)),
+            }).dropna(subset=["X", "Y"])
+            teams = steps_df["team"].astype(str).str.upper().map(_TEAM_MAP).astype(object)
+            teams = teams.where(teams.notna(), None)
+            # Few distinct players/teams: dictionary-encode them instead of one str per tick
+            self.footsteps = {
+                "tick": steps_df["tick"].to_numpy(np.int32),
+                "x": steps_df["X"].to_numpy(np.float32),
+                "y": steps_df["Y"].to_numpy(np.float32),
+                "player": pd.Categorical(steps_df["player"]),
+                "team": pd.Categorical(teams, categories=TEAMS)
+            }
+            # Players and their last seen team, resolved once per player instead of per tick
+            self.players.update(p for p in self.footsteps["player"].categories if p)
+            named = steps_df["player"].notna() & steps_df["player"].astype(bool)
+            last_teams = pd.DataFrame({
+                "player": steps_df["player"],
+                "team": teams
+            })[named & teams.notna()].drop_duplicates("player", keep="last")
+            self.player_teams.update(zip(last_teams["player"], last_teams["team"]))
 
         # --- Rounds and Winners ---
         self.rounds = []
@@ -225,41 +255,40 @@ class DemoFileParser:
             "round_end",
             other=["winner", "total_rounds_played"]
         )
-        if round_end_df is not None and not round_end_df.empty:
-            for _, row in round_end_df.iterrows():
-                winner = row.get("winner", None)
-                round_num = row.get("total_rounds_played", None)
-                winner_norm = normalize_team_name(winner)
-                if winner_norm in ("CT", "T") and round_num is not None:
-                    self.rounds.append({
-                        "winner": winner_norm,
-                        "round_num": int(round_num)
-                    })
+        if (round_end_df is not None and not round_end_df.empty
+                and "winner" in round_end_df.columns and "total_rounds_played" in round_end_df.columns):
+            winners = round_end_df["winner"].astype(str).str.upper().map(_TEAM_MAP)
+            round_nums = round_end_df["total_rounds_played"]
+            valid = winners.notna() & round_nums.notna()
+            self.rounds = [
+                {"winner": winner, "round_num": int(round_num)}
+                for winner, round_num in zip(winners[valid], round_nums[valid])
+            ]
 
         # --- Player-Team Assignments ---
         try:
             player_info = parser.parse_player_info()
-            if player_info is not None and not player_info.empty:
-                for _, row in player_info.iterrows():
-                    name = row.get("name")
-                    team_num = row.get("team_number")
-                    if name and team_num:
-                        team = "CT" if team_num == 3 else "T" if team_num == 2 else None
-                        if team:
-                            self.player_teams[name] = team
-                            self.players.add(name)
+            if (player_info is not None and not player_info.empty
+                    and "name" in player_info.columns and "team_number" in player_info.columns):
+                names = player_info["name"]
+                teams = player_info["team_number"].map({3: "CT", 2: "T"})
+                valid = names.notna() & names.astype(bool) & teams.notna()
+                self.player_teams.update(zip(names[valid], teams[valid]))
+                self.players.update(names[valid])
         except Exception:
             pass
 
         # Fallback: infer teams from ticks if still missing
         if not self.player_teams and ticks_df is not None and not ticks_df.empty:
-            for _, row in ticks_df.iterrows():
-                pname = row.get("player") or row.get("name")
-                tname = row.get("team") or row.get("team_name")
-                norm_team = normalize_team_name(tname)
-                if pname and norm_team in ("CT", "T"):
-                    self.player_teams[pname] = norm_team
-                    self.players.add(pname)
+            pnames = _column_or(ticks_df, "player", "name")
+            teams = _column_or(ticks_df, "team", "team_name").astype(str).str.upper().map(_TEAM_MAP)
+            valid = pnames.notna() & pnames.astype(bool) & teams.notna()
+            last_teams = pd.DataFrame({
+                "player": pnames[valid],
+                "team": teams[valid]
+            }).drop_duplicates("player", keep="last")
+            self.player_teams.update(zip(last_teams["player"], last_teams["team"]))
+            self.players.update(last_teams["player"])
 
         # --- Store to cache ---
         stored_data = {
@@ -271,21 +300,35 @@ class DemoFileParser:
             "player_deaths": self.player_deaths,
             "weapon_popularity": self.weapon_popularity
         }
-        if not isinstance(demoDataCache, dict):
-            demoDataCache.insert(self.file, stored_data, cost=len(self.footsteps))
-        else:
-            demoDataCache[self.file] = stored_data
-
-        check_cache_folder_size()
         try:
-            with open(cache_file, "wb") as f:
-                pickle.dump(stored_data, f)
+            demoDataCache.set(cache_key, stored_data)
         except Exception:
             pass
 
 # --- Threaded Header Parser ---
 
+class _DemParseWorker(QRunnable):
+    """
+    Pulls demo paths from a shared queue and parses them until the queue is empty.
+    """
+    def __init__(self, owner, paths):
+        super().__init__()
+        self.owner = owner
+        self.paths = paths
+
+    def run(self):
+        while not self.owner.isInterruptionRequested():
+            try:
+                path = self.paths.get_nowait()
+            except queue.Empty:
+                return
+            self.owner._parse_one(path)
+
 class DemHeaderParseThread(QThread):
+    """
+    Parses demo files on a pool of worker threads.
+    Signals are emitted from the workers and delivered queued to the receivers.
+    """
     file_parsed = Signal(str, dict, str)
     current_info = Signal(str, int, int, int)
     finished = Signal()
@@ -293,20 +336,37 @@ class DemHeaderParseThread(QThread):
     def __init__(self, files):
         super().__init__()
         self.files = files
+        self._done = 0
+        self._lock = threading.Lock()
+
+    def _parse_one(self, path):
+        name = os.path.basename(path)
+        fsize = os.path.getsize(path) if os.path.exists(path) else 0
+        err = ""
+        hdr = {}
+        try:
+            dp = DemoFileParser(path)
+            hdr = dp.header
+        except Exception as e:
+            err = str(e)
+        # Progress counts finished files: with several workers, the last file to start is
+        # not the last to finish, and a full progress dialog closes itself
+        self.file_parsed.emit(path, hdr, err)
+        with self._lock:
+            self._done += 1
+            index = self._done
+        self.current_info.emit(name, index, len(self.files), fsize)
 
     def run(self):
-        total = len(self.files)
-        for i, path in enumerate(self.files):
-            name = os.path.basename(path)
-            fsize = os.path.getsize(path) if os.path.exists(path) else 0
-            self.current_info.emit(name, i + 1, total, fsize)
-            err = ""
-            hdr = {}
-            try:
-                dp = DemoFileParser(path)
-                hdr = dp.header
-            except Exception as e:
-                err = str(e)
-            self.file_parsed.emit(path, hdr, err)
-            time.sleep(0.1)
+        paths = queue.Queue()
+        for path in self.files:
+            paths.put(path)
+        # Leave a couple of cores for the UI thread and the OS
+        worker_count = max(1, min(QThread.idealThreadCount() - 2, len(self.files)))
+        pool = QThreadPool()
+        pool.setMaxThreadCount(worker_count)
+        workers = [_DemParseWorker(self, paths) for _ in range(worker_count)]
+        for worker in workers:
+            pool.start(worker)
+        pool.waitForDone()
         self.finished.emit()
@@ -1,32 +1,136 @@
 import os
 from PySide6.QtWidgets import QFileDialog, QMessageBox
-from PySide6.QtGui import QImage, QPainter
-from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QImage, QPainter, QImageWriter
+from PySide6.QtCore import Qt, QRectF, QPointF
 import os
-import tempfile
-import vpk
-import vdf
 from PySide6.QtWidgets import QMessageBox, QInputDialog
 from PySide6.QtGui import QImage, QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThreadPool, QRunnable, QFileSystemWatcher
 import re
-from .parser import SESSION_TEMP_FOLDER
+import json
+import mmap
+import struct
+from .parser import SESSION_TEMP_FOLDER, radarImageCache
 from .common import (
     load_qimage_from_path,
-    load_radar_info,
+    parse_radar_info,
+    RadarInfo,
+    DEFAULT_RADAR_INFO,
     get_workshop_folder,
     get_official_vpk_path,
-    fetch_file_from_vpk
+    fetch_file_from_vpk,
+    open_vpk,
+    invalidate_vpk_caches
 )
+# Shown when no radar image can be loaded. Shared, so never paint on it in place
+_FALLBACK_RADAR_IMG = QImage(512, 512, QImage.Format_RGB888)
+_FALLBACK_RADAR_IMG.fill(Qt.darkGray)
+
+# Characters not allowed in session cache file names
+_SAFE_NAME_RE = re.compile(r"[^a-zA-Z0-9_.-]+")
+
 def session_radar_image_path(map_name, addon):
-    safe_map = re.sub(r"[^a-zA-Z0-9_.-]+", "_", map_name or "unknown")
-    safe_addon = re.sub(r"[^a-zA-Z0-9_.-]+", "_", addon or "official")
-    return os.path.join(SESSION_TEMP_FOLDER, f"radar_{safe_map}_{safe_addon}.png")
+    safe_map = _SAFE_NAME_RE.sub("_", map_name or "unknown")
+    safe_addon = _SAFE_NAME_RE.sub("_", addon or "official")
+    return os.path.join(SESSION_TEMP_FOLDER, f"radar_{safe_map}_{safe_addon}.qimg")
+
+# magic, width, height, bytes per line, QImage.Format
+_RAW_HEADER = struct.Struct("<4sIIII")
+_RAW_MAGIC = b"QIMG"
+
+def _write_raw(qimg, path):
+    """
+    Dump the raw pixel buffer of a QImage to path, skipping any image encoding.
+    Written to a temp file and renamed so readers never see a partial file.
+    """
+    tmp_path = path + ".tmp"
+    header = _RAW_HEADER.pack(_RAW_MAGIC, qimg.width(), qimg.height(),
+                              qimg.bytesPerLine(), qimg.format().value)
+    flags = os.O_CREAT | os.O_WRONLY | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    try:
+        fd = os.open(tmp_path, flags, 0o644)
+        try:
+            os.write(fd, header + bytes(qimg.constBits()))
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+
+def _read_raw(path):
+    """
+    Map a file written by _write_raw and wrap it in a QImage without copying.
+    Returns None if the file is missing or not a raw image dump.
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mm) < _RAW_HEADER.size:
+        return None
+    magic, w, h, bpl, fmt = _RAW_HEADER.unpack_from(mm, 0)
+    if magic != _RAW_MAGIC or len(mm) < _RAW_HEADER.size + bpl * h:
+        return None
+    img = QImage(memoryview(mm)[_RAW_HEADER.size:], w, h, bpl, QImage.Format(fmt))
+    # The QImage only borrows the mapped buffer
+    img._buffer = mm
+    return img if not img.isNull() else None
+
+def vtex_cache_key(vpk_path, radar_path):
+    """
+    Return (key, tag) of radar_path's decode in radarImageCache. The key changes with
+    the VPK's mtime; the tag does not, so it finds decodes of older VPK versions.
+    """
+    return (vpk_path, os.path.getmtime(vpk_path), radar_path), f"{vpk_path}|{radar_path}"
+
+class _RawSaveRunnable(QRunnable):
+    """
+    Writes a session radar image with _write_raw on a pool thread.
+    """
+    def __init__(self, qimg, path):
+        super().__init__()
+        # Implicitly shared with the caller's image; no pixels are copied
+        self.qimg = QImage(qimg)
+        self.path = path
+
+    def run(self):
+        _write_raw(self.qimg, self.path)
+
+def session_radar_info_path(map_name, addon):
+    return os.path.splitext(session_radar_image_path(map_name, addon))[0] + ".json"
+
+def save_session_radar_info(map_name, addon, radar_info):
+    """
+    Store radar info next to the session radar image.
+    Written to a temp file and renamed so readers never see a partial file.
+    """
+    path = session_radar_info_path(map_name, addon)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(radar_info._asdict(), f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+def load_session_radar_info(map_name, addon):
+    """
+    Return the radar info stored by save_session_radar_info, or None if missing or unreadable.
+    """
+    try:
+        with open(session_radar_info_path(map_name, addon), encoding="utf-8") as f:
+            data = json.load(f)
+        return RadarInfo(float(data["pos_x"]), float(data["pos_y"]), float(data["scale"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
 
 class RadarLoader:
     """
     Handles loading and processing of radar images for CS2 maps.
     Supports both official and workshop maps, with caching for performance.
+    Keep one instance per window so the VPK radar index survives map switches.
     """
 
     def __init__(self, parent=None):
@@ -37,7 +141,22 @@ class RadarLoader:
             parent: The parent widget that will display error messages
         """
         self.parent = parent
-        self.radar_info = {"pos_x": 0, "pos_y": 0, "scale": 1}
+        self.radar_info = DEFAULT_RADAR_INFO
+        # vpk_path -> (vpk.VPK handle, [(lower-cased path, path) of every overheadmaps texture])
+        self._vpk_cache = {}
+        # (vpk_path, lower-cased map name) -> matching radar image paths
+        self._radar_match_cache = {}
+        # Drops the VPK caches when a watched VPK or its folder changes on disk
+        self._watcher = QFileSystemWatcher()
+        self._watcher.directoryChanged.connect(self._invalidate_vpk_cache)
+        self._watcher.fileChanged.connect(self._invalidate_vpk_cache)
+        # (image cacheKey, w_scaled, h_scaled), scaled QPixmap
+        self._scaled_cache = (None, None)
+        # (map_name, addon), radar image, radar info of the last successful load. Handing the
+        # same QImage back for a repeated map keeps its cacheKey, so _scaled_cache hits
+        self._last_radar = (None, None, None)
+        # (map_name, addon) -> resolved VPK path
+        self._vpk_path_cache = {}
 
     def load_map_radar(self, map_name, addon=None):
         """
@@ -50,20 +169,31 @@ class RadarLoader:
         Returns:
             tuple: (radar_image, radar_info, success)
                 - radar_image: QImage of the radar
-                - radar_info: Dictionary with pos_x, pos_y, scale
+                - radar_info: RadarInfo with pos_x, pos_y, scale
                 - success: Boolean indicating if loading was successful
         """
-        self.radar_info = {"pos_x": 0, "pos_y": 0, "scale": 1}
+        key = (map_name, addon)
+        if self._last_radar[0] == key:
+            _, radar_img, self.radar_info = self._last_radar
+            return radar_img, self.radar_info, True
+
+        self.radar_info = DEFAULT_RADAR_INFO
         radar_img = None
 
         # Try session cache first
         radar_img_path = session_radar_image_path(map_name, addon)
         if os.path.isfile(radar_img_path):
-            radar_img = load_qimage_from_path(radar_img_path)
+            radar_img = _read_raw(radar_img_path)
             if radar_img and not radar_img.isNull():
-                # Load radar config
-                if not self._load_radar_config(map_name, addon):
-                    return None, self.radar_info, False
+                # Radar config from the session sidecar, so a warm hit never opens the VPK
+                cached_info = load_session_radar_info(map_name, addon)
+                if cached_info is not None:
+                    self.radar_info = cached_info
+                else:
+                    vpk_path = self._get_vpk_path(map_name, addon)
+                    if not vpk_path or not self._load_radar_config(map_name, vpk_path, addon):
+                        return None, self.radar_info, False
+                self._last_radar = (key, radar_img, self.radar_info)
                 return radar_img, self.radar_info, True
 
         # Determine VPK path
@@ -72,7 +202,7 @@ class RadarLoader:
             return None, self.radar_info, False
 
         # Load radar config
-        if not self._load_radar_config(map_name, addon):
+        if not self._load_radar_config(map_name, vpk_path, addon):
             return None, self.radar_info, False
 
         # Load radar image
@@ -80,13 +210,14 @@ class RadarLoader:
 
         # Save to session cache for future fast switching
         if radar_img and not radar_img.isNull():
-            radar_img.save(radar_img_path, "PNG")
+            # The file is only needed on the next load, so don't block the UI writing it
+            QThreadPool.globalInstance().start(_RawSaveRunnable(radar_img, radar_img_path))
+            self._last_radar = (key, radar_img, self.radar_info)
             return radar_img, self.radar_info, True
 
         # Create fallback image if loading failed
         if not radar_img or radar_img.isNull():
-            radar_img = QImage(512, 512, QImage.Format_RGB888)
-            radar_img.fill(Qt.darkGray)
+            radar_img = _FALLBACK_RADAR_IMG
 
         return radar_img, self.radar_info, True
 
@@ -101,6 +232,10 @@ class RadarLoader:
         Returns:
             str: Path to the VPK file or None if not found
         """
+        key = (map_name, addon)
+        if key in self._vpk_path_cache:
+            return self._vpk_path_cache[key]
+
         if addon:
             vpk_path = os.path.join(get_workshop_folder(addon), f"{addon}_dir.vpk")
             if not os.path.isfile(vpk_path):
@@ -124,33 +259,63 @@ class RadarLoader:
                     )
                 return None
 
+        self._vpk_path_cache[key] = vpk_path
         return vpk_path
 
-    def _load_radar_config(self, map_name, addon=None):
+    def _invalidate_vpk_cache(self, _path=None):
+        self._vpk_cache.clear()
+        self._radar_match_cache.clear()
+        self._vpk_path_cache.clear()
+        self._last_radar = (None, None, None)
+        invalidate_vpk_caches()
+
+    def _get_vpk(self, vpk_path):
+        """
+        Get the opened VPK and its overhead map textures, scanning the directory once until the VPK changes.
+
+        Args:
+            vpk_path: Path to the VPK file
+
+        Returns:
+            tuple: (vpk_handle, radar_paths)
+                - vpk_handle: The opened vpk.VPK
+                - radar_paths: List of (lower-cased path, path) for every overheadmaps .vtex_c in the VPK
+        """
+        cached = self._vpk_cache.get(vpk_path)
+        if cached is None:
+            pak = open_vpk(vpk_path)
+            radar_paths = []
+            for file_path in pak:
+                lower_path = file_path.lower()
+                if "overheadmaps" in lower_path and lower_path.endswith(".vtex_c"):
+                    radar_paths.append((lower_path, file_path))
+            cached = (pak, radar_paths)
+            self._vpk_cache[vpk_path] = cached
+            watched = set(self._watcher.files()) | set(self._watcher.directories())
+            for path in (vpk_path, os.path.dirname(vpk_path)):
+                if path not in watched:
+                    self._watcher.addPath(path)
+        return cached
+
+    def _load_radar_config(self, map_name, vpk_path, addon=None):
         """
         Load the radar configuration for the specified map.
 
         Args:
             map_name: The name of the map
+            vpk_path: Path to the VPK file, as resolved by _get_vpk_path
             addon: The workshop addon ID if it's a workshop map
 
         Returns:
             bool: True if loading was successful, False otherwise
         """
-        vpk_path = self._get_vpk_path(map_name, addon)
-        if not vpk_path:
-            return False
-
         cfg_path = f"resource/overviews/{map_name}.txt"
         try:
-            with vpk.open(vpk_path) as p:
-                cfgfile = p.get_file(cfg_path)
+            p, _ = self._get_vpk(vpk_path)
+            with p.get_file(cfg_path) as cfgfile:
                 raw = cfgfile.read().decode('utf-8')
-            with tempfile.NamedTemporaryFile(delete=False, mode='w', encoding='utf-8') as t:
-                t.write(raw)
-                tmp = t.name
-            rconfig = vdf.load(open(tmp))
-            self.radar_info = load_radar_info(rconfig)
+            self.radar_info = parse_radar_info(raw)
+            save_session_radar_info(map_name, addon, self.radar_info)
             return True
         except Exception as e:
             if self.parent:
@@ -172,16 +337,16 @@ class RadarLoader:
         Returns:
             str: Path to the radar image within the VPK or None if not found
         """
-        matches = []
-        try:
-            with vpk.open(vpk_path) as p:
-                for file_path in p:
-                    lower_path = file_path.lower()
-                    if "overheadmaps" in lower_path and f"{map_name.lower()}_radar" in lower_path and lower_path.endswith(
-                            ".vtex_c"):
-                        matches.append(file_path)
-        except Exception:
-            return None
+        key = (vpk_path, map_name.lower())
+        matches = self._radar_match_cache.get(key)
+        if matches is None:
+            try:
+                _, radar_paths = self._get_vpk(vpk_path)
+            except Exception:
+                return None
+            needle = f"{key[1]}_radar"
+            matches = [path for lower_path, path in radar_paths if needle in lower_path]
+            self._radar_match_cache[key] = matches
 
         if not matches:
             return None
@@ -208,18 +373,40 @@ class RadarLoader:
         Returns:
             QImage: The loaded radar image or None if loading failed
         """
+        # A path from the VPK index already proves the VPK exists
         radar_path = self._fetch_radar_path(vpk_path, map_name)
+        if not radar_path:
+            return None
 
-        if radar_path and os.path.isfile(vpk_path):
-            extracted_path = fetch_file_from_vpk(
-                vpk_path,
-                radar_path,
-                "vtex_",
-                ["-d", "--vpk_filepath", radar_path]
-            )
-            return load_qimage_from_path(extracted_path)
-        else:
-            return load_qimage_from_path(radar_path) if radar_path else None
+        # A decode from an earlier session skips the decompiler run entirely
+        try:
+            cache_key, cache_tag = vtex_cache_key(vpk_path, radar_path)
+        except OSError:
+            cache_key = None
+        if cache_key is not None:
+            data = radarImageCache.get(cache_key)
+            if data is not None:
+                img = QImage.fromData(data)
+                if not img.isNull():
+                    return img
+
+        extracted_path = fetch_file_from_vpk(
+            vpk_path,
+            radar_path,
+            "vtex_",
+            ["-d", "--vpk_filepath", radar_path]
+        )
+        img = load_qimage_from_path(extracted_path)
+        if img is not None and cache_key is not None:
+            try:
+                with open(extracted_path, "rb") as f:
+                    data = f.read()
+                # Decodes of this radar from older VPK versions can never be hit again
+                radarImageCache.evict(cache_tag)
+                radarImageCache.set(cache_key, data, tag=cache_tag)
+            except OSError:
+                pass
+        return img
 
     def apply_radar_to_scene(self, radar_img, scene, base_item):
         """
@@ -234,21 +421,30 @@ class RadarLoader:
             tuple: (img_width, img_height) The dimensions of the applied image
         """
         if not radar_img or radar_img.isNull():
-            radar_img = QImage(512, 512, QImage.Format_RGB888)
-            radar_img.fill(Qt.darkGray)
+            radar_img = _FALLBACK_RADAR_IMG
 
         img_w, img_h = radar_img.width(), radar_img.height()
-        scale_val = self.radar_info.get("scale", 1)
+        pos_x, pos_y, scale_val = self.radar_info
         w_scaled = int(img_w * scale_val)
         h_scaled = int(img_h * scale_val)
-        pos_x = self.radar_info.get("pos_x", 0)
-        pos_y = self.radar_info.get("pos_y", 0)
 
-        pixmap = QPixmap.fromImage(radar_img).scaled(
-            w_scaled, h_scaled, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
-        )
-        base_item.setPixmap(pixmap)
-        base_item.setOffset(pos_x, pos_y - h_scaled)
+        key = (radar_img.cacheKey(), w_scaled, h_scaled)
+        if self._scaled_cache[0] == key:
+            pixmap = self._scaled_cache[1]
+        else:
+            pixmap = QPixmap.fromImage(radar_img)
+            # No resample at all when the overview is drawn at its native size
+            if abs(scale_val - 1.0) > 1e-6:
+                pixmap = pixmap.scaled(
+                    w_scaled, h_scaled, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+                )
+            self._scaled_cache = (key, pixmap)
+        # Only touch the item and the scene when something changed; each setter invalidates the views
+        if base_item.pixmap().cacheKey() != pixmap.cacheKey():
+            base_item.setPixmap(pixmap)
+        offset = QPointF(pos_x, pos_y - h_scaled)
+        if base_item.offset() != offset:
+            base_item.setOffset(offset)
 
         # Set scene rect with margin
         margin = 200
@@ -256,12 +452,14 @@ class RadarLoader:
         x_max = pos_x + w_scaled
         y_min = pos_y - h_scaled
         y_max = pos_y
-        scene.setSceneRect(
+        new_rect = QRectF(
             x_min - margin,
             y_min - margin,
             (x_max - x_min) + 2 * margin,
             (y_max - y_min) + 2 * margin
         )
+        if scene.sceneRect() != new_rect:
+            scene.setSceneRect(new_rect)
 
         return img_w, img_h
 
@@ -271,6 +469,12 @@ class RadarImageSaver:
     Provides functionality to save the current radar view as a PNG image.
     """
 
+    # Edge length of the square buffer the scene is rendered through
+    TILE = 1024
+    # Spare render buffers kept per (width, height); only the tile size and the
+    # most recently saved scene size are pooled
+    POOL_DEPTH = 2
+
     def __init__(self, parent=None):
         """
         Initialize the RadarImageSaver.
@@ -279,14 +483,34 @@ class RadarImageSaver:
             parent: The parent widget (typically HeatmapWindow)
         """
         self.parent = parent
+        # (width, height) -> spare ARGB32 premultiplied images, reused across saves
+        self._image_pool = {}
 
-    def save_radar_image(self, scene, map_name=None):
+    def _acquire(self, w, h):
+        """Return a transparent w x h image, reusing a pooled buffer when one is free."""
+        bucket = self._image_pool.get((w, h))
+        img = bucket.pop() if bucket else QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+        img.fill(Qt.transparent)
+        return img
+
+    def _release(self, img):
+        """Hand an image from _acquire back to the pool, dropping buffers of older scene sizes."""
+        size = (img.width(), img.height())
+        keep = (size, (self.TILE, self.TILE))
+        for key in [k for k in self._image_pool if k not in keep]:
+            del self._image_pool[key]
+        bucket = self._image_pool.setdefault(size, [])
+        if len(bucket) < self.POOL_DEPTH:
+            bucket.append(img)
+
+    def save_radar_image(self, scene, map_name=None, aa=False):
         """
         Save the current radar view as a PNG image.
 
         Args:
             scene: The QGraphicsScene containing the radar view
             map_name: The name of the current map (optional)
+            aa: Antialias vector items; the radar and heatmap are pixmaps and don't need it
 
         Returns:
             bool: True if save was successful, False otherwise
@@ -317,20 +541,37 @@ class RadarImageSaver:
             QMessageBox.warning(self.parent, "Save Error", "Invalid scene rect.")
             return False
 
-        # Create image with same dimensions as scene
-        img = QImage(int(sr.width()), int(sr.height()), QImage.Format_ARGB32_Premultiplied)
-        img.fill(Qt.transparent)
-
-        # Render scene to image
-        p = QPainter(img)
-        p.setRenderHint(QPainter.Antialiasing)
-        p.setRenderHint(QPainter.SmoothPixmapTransform)
-        scene.render(p, QRectF(img.rect()), sr)
-        p.end()
-
-        # Save image
-        if not img.save(name, "PNG"):
-            QMessageBox.warning(self.parent, "Save Error", f"Couldn't save to {name}")
-            return False
+        # Scene-sized output image plus the tile buffer it is rendered through
+        w, h = int(sr.width()), int(sr.height())
+        img = self._acquire(w, h)
+        tile = self._acquire(self.TILE, self.TILE)
+        try:
+            # Render the scene tile by tile through one reused buffer, so the
+            # render pass only ever works on TILE x TILE pixels at a time
+            dst = QPainter(img)
+            dst.setCompositionMode(QPainter.CompositionMode_Source)
+            for ty in range(0, h, self.TILE):
+                th = min(self.TILE, h - ty)
+                for tx in range(0, w, self.TILE):
+                    tw = min(self.TILE, w - tx)
+                    tile.fill(Qt.transparent)
+                    p = QPainter(tile)
+                    p.setRenderHint(QPainter.Antialiasing, aa)
+                    p.setRenderHint(QPainter.SmoothPixmapTransform)
+                    scene.render(p, QRectF(0, 0, tw, th), QRectF(sr.x() + tx, sr.y() + ty, tw, th))
+                    p.end()
+                    dst.drawImage(tx, ty, tile, 0, 0, tw, th)
+            dst.end()
+
+            # Save image. For PNG, Qt maps quality 85 to zlib level 1: much faster than
+            # the default level and, on radar/heatmap output, no larger
+            writer = QImageWriter(name, b"png")
+            writer.setQuality(85)
+            if not writer.write(img):
+                QMessageBox.warning(self.parent, "Save Error", f"Couldn't save to {name}\n{writer.errorString()}")
+                return False
+        finally:
+            self._release(tile)
+            self._release(img)
 
         return True
@@ -3,10 +3,11 @@ from PySide6.QtWidgets import (
     QGraphicsView,
     QWidget, QHBoxLayout, QVBoxLayout,
     QLabel, QSlider, QDoubleSpinBox, QSpinBox,
-    QFormLayout, QGroupBox, QLineEdit
+    QFormLayout, QGroupBox, QLineEdit,
+    QStyle, QStyleOptionFrame, QStyleOptionSpinBox, QAbstractSpinBox
 )
 from PySide6.QtGui import QPainter
-from PySide6.QtCore import Qt, Signal, Slot, QPointF
+from PySide6.QtCore import Qt, Signal, Slot, QPointF, QTimer, QEvent, QSize
 
 
 class ZoomableGraphicsView(QGraphicsView):
@@ -20,6 +21,43 @@ class ZoomableGraphicsView(QGraphicsView):
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
 
+        # Coalesce mouse_moved to at most one emission per ~frame
+        self._pending_pos = None
+        self._emit_timer = QTimer(self)
+        self._emit_timer.setSingleShot(True)
+        self._emit_timer.setInterval(16)
+        self._emit_timer.timeout.connect(self._flush_mouse)
+
+    def use_opengl_viewport(self):
+        """
+        Render through an OpenGL viewport so composition, pan and zoom run on the GPU.
+        Qt's GL paint engine only has the advanced composition modes (Screen, used by the
+        heatmap overlay) with a blend_equation_advanced extension, so the software viewport
+        is kept when that, or OpenGL itself, is unavailable. Returns whether it was switched.
+        """
+        try:
+            from PySide6.QtGui import QOpenGLContext, QOffscreenSurface
+            from PySide6.QtOpenGLWidgets import QOpenGLWidget
+        except ImportError:
+            return False
+        ctx = QOpenGLContext()
+        surface = QOffscreenSurface()
+        surface.create()
+        try:
+            if not ctx.create() or not ctx.makeCurrent(surface):
+                return False
+            supported = (ctx.hasExtension(b"GL_KHR_blend_equation_advanced")
+                         or ctx.hasExtension(b"GL_NV_blend_equation_advanced"))
+            ctx.doneCurrent()
+        finally:
+            surface.destroy()
+        if not supported:
+            return False
+        self.setViewport(QOpenGLWidget())
+        # A GL viewport cannot repaint partial regions, so always redraw it whole
+        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        return True
+
     def wheelEvent(self, e):
         factor = 1.15 if e.angleDelta().y() > 0 else 1 / 1.15
         old = self.mapToScene(e.position().toPoint())
@@ -28,10 +66,17 @@ class ZoomableGraphicsView(QGraphicsView):
         self.translate(delta.x(), delta.y())
 
     def mouseMoveEvent(self, e):
-        pt = self.mapToScene(e.position().toPoint())
-        self.mouse_moved.emit(pt.x(), pt.y())
+        self._pending_pos = self.mapToScene(e.position().toPoint())
+        if not self._emit_timer.isActive():
+            self._emit_timer.start()
         super().mouseMoveEvent(e)
 
+    def _flush_mouse(self):
+        pt = self._pending_pos
+        if pt is not None:
+            self._pending_pos = None
+            self.mouse_moved.emit(pt.x(), pt.y())
+
 
 class LabeledSliderSpinBox(QWidget):
     """
@@ -60,47 +105,126 @@ class LabeledSliderSpinBox(QWidget):
             self._slider.setValue(int(default_value))
         self._layout.addWidget(self._slider)
 
+        # The spinbox is built the first time the pointer enters or the slider takes focus.
+        # Until then a plain label shows the value in the spinbox's slot, at its size.
+        self._spin = None
+        self._value = float(default_value)
+        # Set while mirroring one control into the other
+        self._syncing = False
+        self._minimum = minimum
+        self._maximum = maximum
+        self._single_step = single_step
+        self._decimals = 2 if single_step < 1 else 0
+
+        self._readout = QLabel(self._format_value(self._value), self)
+        self._readout.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self._readout.setFixedSize(self._spin_size_hint())
+        self._layout.addWidget(self._readout)
+
+        # Connect signals
+        self._slider.valueChanged.connect(self._on_slider_changed)
+        self._slider.installEventFilter(self)
+
+    def _format_value(self, val):
+        if self.is_float:
+            return f"{val:.{self._decimals}f}"
+        return str(int(val))
+
+    def _spin_size_hint(self):
+        """
+        The size hint the spinbox will have, worked out through the style the same way
+        QAbstractSpinBox::sizeHint does, so swapping it in does not re-lay out the row.
+        """
+        fm = self.fontMetrics()
+        text_w = max(fm.horizontalAdvance(self._format_value(v) + " ")
+                     for v in (self._minimum, self._maximum)) + 2
+        style = self.style()
+        edit_opt = QStyleOptionFrame()
+        edit_opt.initFrom(self)
+        edit_opt.lineWidth = 0
+        text_h = style.sizeFromContents(
+            QStyle.CT_LineEdit, edit_opt, QSize(text_w, max(fm.height(), 14) + 2), self).height()
+        spin_opt = QStyleOptionSpinBox()
+        spin_opt.initFrom(self)
+        spin_opt.frame = True
+        spin_opt.buttonSymbols = QAbstractSpinBox.UpDownArrows
+        spin_opt.subControls = (QStyle.SC_SpinBoxFrame | QStyle.SC_SpinBoxEditField
+                                | QStyle.SC_SpinBoxUp | QStyle.SC_SpinBoxDown)
+        return style.sizeFromContents(QStyle.CT_SpinBox, spin_opt, QSize(text_w, text_h), self)
+
+    def _ensure_spin(self):
+        if self._spin is not None:
+            return self._spin
         if self.is_float:
             self._spin = QDoubleSpinBox(self)
-            self._spin.setDecimals(2 if single_step < 1 else 0)
-            self._spin.setRange(minimum, maximum)
-            self._spin.setSingleStep(single_step)
-            self._spin.setValue(default_value)
+            self._spin.setDecimals(self._decimals)
+            self._spin.setRange(self._minimum, self._maximum)
+            self._spin.setSingleStep(self._single_step)
+            self._spin.setValue(self._value)
         else:
             self._spin = QSpinBox(self)
-            self._spin.setRange(int(minimum), int(maximum))
-            self._spin.setSingleStep(int(single_step))
-            self._spin.setValue(int(default_value))
-
-        self._layout.addWidget(self._spin)
+            self._spin.setRange(int(self._minimum), int(self._maximum))
+            self._spin.setSingleStep(int(self._single_step))
+            self._spin.setValue(int(self._value))
 
-        # Connect signals
-        self._slider.valueChanged.connect(self._on_slider_changed)
+        # Take over the readout's slot; a stylesheet may still make the spinbox larger
+        self._spin.setFixedSize(self._readout.size().expandedTo(self._spin.sizeHint()))
+        self._layout.replaceWidget(self._readout, self._spin)
+        self._readout.deleteLater()
+        self._readout = None
         self._spin.valueChanged.connect(self._on_spin_changed)
+        return self._spin
+
+    def enterEvent(self, e):
+        self._ensure_spin()
+        super().enterEvent(e)
+
+    def eventFilter(self, obj, e):
+        if obj is self._slider and e.type() == QEvent.FocusIn:
+            self._ensure_spin()
+        return super().eventFilter(obj, e)
 
     def _on_slider_changed(self, val):
+        if self._syncing:
+            return
         real_val = float(val) / 100 if self.is_float else float(val)
-        self._spin.blockSignals(True)
-        self._spin.setValue(real_val)
-        self._spin.blockSignals(False)
+        self._value = real_val
+        if self._readout is not None:
+            self._readout.setText(self._format_value(real_val))
+        if self._spin is not None and abs(self._spin.value() - real_val) > 1e-9:
+            self._syncing = True
+            try:
+                self._spin.setValue(real_val)
+            finally:
+                self._syncing = False
         self.valueChanged.emit(real_val)
 
     def _on_spin_changed(self, val):
+        if self._syncing:
+            return
         # val is float or int
         if self.is_float:
             scaled = int(val * 100)
         else:
             scaled = int(val)
-        self._slider.blockSignals(True)
-        self._slider.setValue(scaled)
-        self._slider.blockSignals(False)
+        self._value = float(val)
+        if self._readout is not None:
+            self._readout.setText(self._format_value(self._value))
+        if self._slider.value() != scaled:
+            self._syncing = True
+            try:
+                self._slider.setValue(scaled)
+            finally:
+                self._syncing = False
         self.valueChanged.emit(float(val))
 
     def get_value(self) -> float:
-        return float(self._spin.value())
+        return self._value
 
     def set_value(self, val: float):
-        self._spin.setValue(val)
+        val = min(max(val, self._minimum), self._maximum)
+        if self._spin is not None:
+            self._spin.setValue(val)
         self._on_spin_changed(val)
 
 
@@ -1,10 +1,12 @@
 import os
+import bisect
+import threading
 import numpy as np
 from PySide6.QtWidgets import (
     QMainWindow, QGraphicsScene, QGraphicsPixmapItem, QStatusBar, QTreeWidget, QComboBox, QCheckBox,
     QSpinBox, QGroupBox, QVBoxLayout, QHBoxLayout, QLabel, QWidget, QPushButton, QSplitter, QSizePolicy, QSpacerItem
 )
-from PySide6.QtGui import QIcon, QPixmap, QImage, QPainter, QAction
+from PySide6.QtGui import QIcon, QPixmap, QImage, QPainter, QAction, QTransform
 from PySide6.QtCore import Qt, QTimer, Slot
 
 from .parser import *
@@ -18,10 +20,35 @@ class TransparentHeatmapItem(QGraphicsPixmapItem):
         painter.setCompositionMode(QPainter.CompositionMode_Screen)
         super().paint(painter, option, widget)
 
+def preload_heavy_modules():
+    """
+    Import the modules the heatmap and parser load lazily, so that opening the window
+    does not wait for them and the first demo/heatmap does not either.
+    """
+    try:
+        import pandas
+        import scipy.fft
+        import scipy.ndimage
+        from matplotlib import colormaps
+    except ImportError:
+        pass
+
+def _category_codes(values):
+    """
+    Return (int16 codes, {name: code}) for a Categorical or a plain array of names.
+    """
+    if hasattr(values, "categories"):
+        codes = np.asarray(values.codes, dtype=np.int16)
+        categories = values.categories
+    else:
+        categories, codes = np.unique(np.asarray(values), return_inverse=True)
+        codes = codes.astype(np.int16)
+    return codes, {name: i for i, name in enumerate(categories)}
+
 class HeatmapWindow(QMainWindow):
     """
     DemoViewer with advanced heatmap overlay, brightness/contrast, gamma,
-    improved downsampling, and external caching plus QCache for large data.
+    improved downsampling, and a disk-backed LRU cache for parsed demo data.
     Now with robust map switching and session radar image cache.
     """
 
@@ -40,12 +67,15 @@ class HeatmapWindow(QMainWindow):
 
         # Data references
         self.loaded = []
-        self.footsteps = []
+        self.footsteps = empty_footsteps()
+        self.index_footsteps()
         self.deaths = []
         self.maps = []
         self.map_name = None
         self.cur_addon = None
-        self.radar_info = {"pos_x": 0, "pos_y": 0, "scale": 1}
+        self.radar_info = DEFAULT_RADAR_INFO
+        self.radar_loader = RadarLoader(self)
+        self.radar_saver = RadarImageSaver(self)
         self.ct_win_pct = None
         self.t_win_pct = None
 
@@ -59,11 +89,30 @@ class HeatmapWindow(QMainWindow):
         self.heatmap_brightness = 0.0
         self.heatmap_contrast = 1.0
         self.downsample_n = 1
+        # Last normalized heatmap and its placement, recolored without recomputation
+        self.heat_norm = None
+        self.heat_geometry = None
+        # Stage name -> (key, result) for the hist -> blur -> norm pipeline of update_heatmap
+        self._stage_cache = {}
+        # Bumped whenever the merged footsteps/deaths are rebuilt
+        self._data_generation = 0
+        # (data/geometry key, footstep cells sorted by group, group bounds, n_players)
+        self._footstep_cells = None
+        # Entries currently listed in the team/player selectors, besides "All"
+        self._known_teams = {"CT", "T"}
+        self._known_players = set()
+        # Coalesces slider drags into one update; _pending_update is the deepest stage requested
+        self._pending_update = None
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(50)
+        self._update_timer.timeout.connect(self._do_update_heatmap)
 
         # Scene and view
         self.scene = QGraphicsScene(self)
         self.scene.setSceneRect(0, 0, self.img_w, self.img_h)
         self.view = ZoomableGraphicsView(self.scene, self)
+        self.view.use_opengl_viewport()
         self.view.mouse_moved.connect(self.mouse_moved)
 
         self.base_item = QGraphicsPixmapItem()
@@ -72,6 +121,8 @@ class HeatmapWindow(QMainWindow):
 
         self.hm_item = TransparentHeatmapItem()
         self.hm_item.setZValue(1)
+        # The heatmap pixmap stays at grid resolution; the item transform stretches it when drawn
+        self.hm_item.setTransformationMode(Qt.SmoothTransformation)
         self.scene.addItem(self.hm_item)
 
         self.init_menu()
@@ -111,7 +162,7 @@ class HeatmapWindow(QMainWindow):
         self.sigma_widget.valueChanged.connect(self.on_sigma_changed)
 
         self.cmap_combo = QComboBox()
-        self.cmap_combo.addItems(["hot", "jet", "viridis", "plasma", "inferno", "magma", "cividis"])
+        self.cmap_combo.addItems(["hot", "jet", "viridis", "plasma", "inferno", "magma", "cividis", "gray"])
         self.cmap_combo.setCurrentText(self.cur_colormap)
         self.cmap_combo.currentTextChanged.connect(self.on_cmap_changed)
 
@@ -239,6 +290,9 @@ class HeatmapWindow(QMainWindow):
         self.reset_view()
         self.update_info()
 
+        # Once the event loop runs, load the deferred numeric modules off the UI thread
+        QTimer.singleShot(0, lambda: threading.Thread(target=preload_heavy_modules, daemon=True).start())
+
     def on_data_type_changed(self, val: str):
         if val != self.selected_data_type:
             self.selected_data_type = val
@@ -303,17 +357,10 @@ class HeatmapWindow(QMainWindow):
         self.update_info()
         self.update_player_team_selectors()
 
-    def apply_downsampling(self, footsteps):
-        n = max(1, int(self.downsample_n))
-        if n <= 1 or len(footsteps) <= 1:
-            return footsteps
-        idxs = np.linspace(0, len(footsteps) - 1, num=(len(footsteps) // n), dtype=int)
-        return [footsteps[i] for i in idxs]
-
     def load_map(self, mname, addon=None):
         self.cur_addon = addon
         self.active_map = mname
-        loader = RadarLoader(self)
+        loader = self.radar_loader
         radar_img, self.radar_info, success = loader.load_map_radar(mname, addon)
         if not success:
             return
@@ -325,6 +372,7 @@ class HeatmapWindow(QMainWindow):
         self.update_player_team_selectors()
 
     def update_heatmap(self):
+        self.heat_norm = None
         # Choose data source
         if self.selected_data_type == "Footsteps":
             source_items = self.footsteps
@@ -335,7 +383,9 @@ class HeatmapWindow(QMainWindow):
 
         # Fix: Properly check for empty DataFrame or list
         is_empty = False
-        if isinstance(source_items, (list, tuple)):
+        if isinstance(source_items, dict):
+            is_empty = not len(source_items["x"])
+        elif isinstance(source_items, (list, tuple)):
             is_empty = not source_items
         elif hasattr(source_items, "empty"):
             is_empty = source_items.empty
@@ -346,48 +396,9 @@ class HeatmapWindow(QMainWindow):
             self.hm_item.setPixmap(QPixmap())
             return
 
-        scale_val = self.radar_info.get("scale", 1)
+        pos_x, pos_y, scale_val = self.radar_info
         w_scaled = int(self.img_w * scale_val)
         h_scaled = int(self.img_h * scale_val)
-        pos_x = self.radar_info.get("pos_x", 0)
-        pos_y = self.radar_info.get("pos_y", 0)
-
-        player_team_map = {}
-        for d in self.loaded:
-            if d["enabled"]:
-                player_team_map.update(getattr(d["parser"], "player_teams", {}))
-
-        filtered = []
-        if self.selected_data_type == "Footsteps":
-            for (idx, x, y, pname, tname) in source_items:
-                if self.selected_team != "All" and tname != self.selected_team:
-                    continue
-                if self.selected_player != "All" and pname != self.selected_player:
-                    continue
-                if x is None or y is None:
-                    continue
-                lx = (x - pos_x)
-                ly = (y - (pos_y - h_scaled))
-                filtered.append((idx, lx, ly))
-        elif self.selected_data_type == "Player Deaths":
-            for _, row in source_items.iterrows():
-                # Use project format: X, Y, user_name
-                x, y = row.get("X"), row.get("Y")
-                pname = row.get("user_name")
-                tname = player_team_map.get(pname)
-                if self.selected_team != "All" and tname != self.selected_team:
-                    continue
-                if self.selected_player != "All" and pname != self.selected_player:
-                    continue
-                if x is None or y is None:
-                    continue
-                lx = (x - pos_x)
-                ly = (y - (pos_y - h_scaled))
-                filtered.append((row.get("tick", 0), lx, ly))
-
-        if not filtered:
-            self.hm_item.setPixmap(QPixmap())
-            return
 
         max_dim = self.max_res_spin.value()
         downsample = 1
@@ -397,17 +408,128 @@ class HeatmapWindow(QMainWindow):
         w_final = max(1, int(w_scaled / downsample))
         h_final = max(1, int(h_scaled / downsample))
 
-        ds_items = [(idx, lx / downsample, ly / downsample) for idx, lx, ly in filtered]
-
-        from scipy.ndimage import gaussian_filter
-        raw_heat = calc_heatmap_np(ds_items, w_final, h_final)
-        if self.cur_sigma > 0:
-            raw_heat = gaussian_filter(raw_heat, self.cur_sigma)
-
-        hm_qimg = heatmap_to_qimage(
-            raw_heat,
+        # Each stage's key embeds its upstream key, so a stage is recomputed only when one
+        # of its own inputs changed; colors are applied in refresh_heatmap_colors
+        hist_key = (self._data_generation, self.selected_data_type, self.selected_team, self.selected_player,
+                    downsample, w_final, h_final, pos_x, pos_y, h_scaled)
+        hist = self._cached_stage("hist", hist_key, lambda: self.accumulate_heatmap(
+            source_items, downsample, w_final, h_final, pos_x, pos_y, h_scaled))
+        if hist is None:
+            self.hm_item.setPixmap(QPixmap())
+            return
+        blur_key = (hist_key, self.cur_sigma)
+        blurred = self._cached_stage("blur", blur_key, lambda: blur_heatmap(hist, self.cur_sigma))
+        norm_key = (blur_key, self.cmap_gamma)
+        self.heat_norm = self._cached_stage("norm", norm_key, lambda: normalize_heatmap(blurred, gamma=self.cmap_gamma))
+        self.heat_geometry = (downsample, w_scaled, h_scaled, pos_x, pos_y)
+        self.refresh_heatmap_colors()
+
+    def _cached_stage(self, stage, key, compute):
+        """
+        Return the cached result of a heatmap stage if its key is unchanged, else compute and store it.
+        """
+        cached = self._stage_cache.get(stage)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        result = compute()
+        self._stage_cache[stage] = (key, result)
+        return result
+
+    def accumulate_heatmap(self, source_items, downsample, w_final, h_final, pos_x, pos_y, h_scaled):
+        """
+        Filter the selected data by team/player and return the w_final x h_final
+        hit grid, or None if no points survive the filters.
+        """
+        lx = ly = np.empty(0, dtype=np.float32)
+        if self.selected_data_type == "Footsteps":
+            cells = self.footstep_cells(downsample, w_final, h_final, pos_x, pos_y, h_scaled)
+            if not len(cells):
+                return None
+            return heatmap_from_cells(cells, w_final, h_final)
+        elif self.selected_data_type == "Player Deaths" and {"X", "Y"} <= set(source_items.columns):
+            import pandas as pd
+            # Use project format: X, Y, user_name
+            dx = pd.to_numeric(source_items["X"], errors="coerce").to_numpy(dtype=np.float32)
+            dy = pd.to_numeric(source_items["Y"], errors="coerce").to_numpy(dtype=np.float32)
+            mask = ~np.isnan(dx) & ~np.isnan(dy)
+            if "user_name" in source_items.columns:
+                names = source_items["user_name"].to_numpy()
+            else:
+                names = np.full(len(source_items), None, dtype=object)
+            if self.selected_team != "All":
+                player_team_map = {}
+                for d in self.loaded:
+                    if d["enabled"]:
+                        player_team_map.update(getattr(d["parser"], "player_teams", {}))
+                teams = pd.Series(player_team_map, dtype=object).reindex(names).to_numpy()
+                mask &= teams == self.selected_team
+            if self.selected_player != "All":
+                mask &= names == self.selected_player
+            inv_ds = np.float32(1.0 / downsample)
+            lx = (dx[mask] - np.float32(pos_x)) * inv_ds
+            ly = (dy[mask] - np.float32(pos_y - h_scaled)) * inv_ds
+
+        if not len(lx):
+            return None
+
+        return calc_heatmap_np(lx, ly, w_final, h_final)
+
+    def footstep_cells(self, downsample, w_final, h_final, pos_x, pos_y, h_scaled):
+        """
+        Return the flat heatmap cell index of every footstep that passes the team/player filters.
+        Cells are computed once per data and geometry and kept sorted by (team, player),
+        so a filter change only gathers the matching groups.
+        """
+        key = (self._data_generation, downsample, w_final, h_final, pos_x, pos_y, h_scaled)
+        if self._footstep_cells is None or self._footstep_cells[0] != key:
+            # Shift to the radar's top-left corner and scale to heatmap pixels in one pass each
+            inv_ds = np.float32(1.0 / downsample)
+            lx = (self.fs_x - np.float32(pos_x)) * inv_ds
+            ly = (self.fs_y - np.float32(pos_y - h_scaled)) * inv_ds
+            cells, inside = heatmap_cell_indices(lx, ly, w_final, h_final)
+            # Group id (team code + 1) * n_players + (player code + 1); code -1 means unknown
+            n_players = len(self.player_code_map) + 1
+            group = (self.fs_team_codes[inside].astype(np.int32) + 1) * n_players
+            group += self.fs_player_codes[inside] + 1
+            order = np.argsort(group, kind="stable")
+            bounds = np.searchsorted(group[order], np.arange((len(TEAMS) + 1) * n_players + 1))
+            self._footstep_cells = (key, cells[order], bounds, n_players)
+
+        _, cells, bounds, n_players = self._footstep_cells
+        if self.selected_team == "All" and self.selected_player == "All":
+            return cells
+        if self.selected_team == "All":
+            team_slots = range(len(TEAMS) + 1)
+        else:
+            team_slots = [TEAM_CODES.get(self.selected_team, -2) + 1]
+        if self.selected_player == "All":
+            player_slots = [None]
+        else:
+            player_slots = [self.player_code_map.get(self.selected_player, -2) + 1]
+        parts = []
+        for t in team_slots:
+            for p in player_slots:
+                if t < 0 or (p is not None and p < 0):
+                    continue
+                if p is None:
+                    # Without a player filter a team's groups are one contiguous run
+                    start, stop = t * n_players, (t + 1) * n_players
+                else:
+                    start = t * n_players + p
+                    stop = start + 1
+                parts.append(cells[bounds[start]:bounds[stop]])
+        return np.concatenate(parts) if parts else cells[:0]
+
+    def refresh_heatmap_colors(self):
+        """
+        Recolor the last computed heatmap with the current colormap, brightness and contrast.
+        """
+        if self.heat_norm is None:
+            return
+        downsample, w_scaled, h_scaled, pos_x, pos_y = self.heat_geometry
+        hm_qimg = colorize_heatmap(
+            self.heat_norm,
             cmap=self.cur_colormap,
-            gamma=self.cmap_gamma,
             brightness=self.heatmap_brightness,
             contrast=self.heatmap_contrast
         )
@@ -415,15 +537,12 @@ class HeatmapWindow(QMainWindow):
             self.hm_item.setPixmap(QPixmap())
             return
 
-        if downsample > 1:
-            pm = QPixmap.fromImage(
-                hm_qimg.scaled(w_scaled, h_scaled, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
-            )
-        else:
-            pm = QPixmap.fromImage(hm_qimg)
-
-        self.hm_item.setPixmap(pm)
-        self.hm_item.setOffset(pos_x, pos_y - h_scaled)
+        # Stretch the grid over exactly w_scaled x h_scaled scene units at paint time
+        self.hm_item.setPixmap(QPixmap.fromImage(hm_qimg))
+        self.hm_item.setTransform(QTransform.fromScale(
+            w_scaled / hm_qimg.width(), h_scaled / hm_qimg.height()
+        ))
+        self.hm_item.setPos(pos_x, pos_y - h_scaled)
 
     @Slot()
     def reset_view(self):
@@ -459,7 +578,7 @@ class HeatmapWindow(QMainWindow):
             self.map_combo.blockSignals(True)
             self.map_combo.setCurrentIndex(idx)
             self.map_combo.blockSignals(False)
-        self.footsteps = []
+        self.footsteps = empty_footsteps()
         self.hm_item.setPixmap(QPixmap())
         self.base_item.setPixmap(QPixmap())
         self.load_map(nm, addon)
@@ -470,9 +589,7 @@ class HeatmapWindow(QMainWindow):
         self.view.setTransform(view_transform)
 
     def mouse_moved(self, sx, sy):
-        s = self.radar_info.get("scale", 1)
-        px = self.radar_info.get("pos_x", 0)
-        py = self.radar_info.get("pos_y", 0)
+        px, py, s = self.radar_info
         wx = sx * s + px
         wy = sy * s + py
         self.statusBar.showMessage(f"Scene: ({sx:.2f}, {sy:.2f}) | World: ({wx:.2f}, {wy:.2f})")
@@ -480,7 +597,7 @@ class HeatmapWindow(QMainWindow):
     def update_info(self):
         addon = self.cur_addon if self.cur_addon else "N/A"
         map_name = self.map_name if self.map_name else "N/A"
-        pts = len(self.footsteps)
+        pts = len(self.footsteps["x"])
         ct_wins, t_wins, total = 0, 0, 0
         for d in self.loaded:
             if d["enabled"] and hasattr(d["parser"], "rounds"):
@@ -511,34 +628,39 @@ class HeatmapWindow(QMainWindow):
             if demo_teams:
                 player_teams.update(demo_teams)
                 teams.update(set(t for t in demo_teams.values() if t in ("CT", "T")))
-        current_team = self.team_selector.currentText()
-        self.team_selector.blockSignals(True)
-        self.team_selector.clear()
-        self.team_selector.addItem("All")
-        for t in sorted(teams):
-            self.team_selector.addItem(t)
-        idx = self.team_selector.findText(current_team)
-        if idx != -1:
-            self.team_selector.setCurrentIndex(idx)
-        else:
-            self.team_selector.setCurrentIndex(0)
-        self.team_selector.blockSignals(False)
-        current_player = self.player_selector.currentText()
-        self.player_selector.blockSignals(True)
-        self.player_selector.clear()
-        self.player_selector.addItem("All")
-        for p in sorted(players):
-            if p:
-                self.player_selector.addItem(p)
-        idx = self.player_selector.findText(current_player)
-        if idx != -1:
-            self.player_selector.setCurrentIndex(idx)
-        else:
-            self.player_selector.setCurrentIndex(0)
-        self.player_selector.blockSignals(False)
+        players -= {"", None}
+        self._sync_selector(self.team_selector, self._known_teams, teams)
+        self._sync_selector(self.player_selector, self._known_players, players)
         self.selected_team = self.team_selector.currentText()
         self.selected_player = self.player_selector.currentText()
 
+    def _sync_selector(self, combo, known, items):
+        """
+        Bring a selector's entries after "All" in line with items, adding and removing only
+        the differences so large player lists are not rebuilt on every demo toggle.
+        Entries stay sorted; known is the set of entries currently listed and is updated in place.
+        """
+        to_add = items - known
+        to_remove = known - items
+        if not to_add and not to_remove:
+            return
+        current = combo.currentText()
+        combo.blockSignals(True)
+        if to_remove:
+            for i in range(combo.count() - 1, 0, -1):
+                if combo.itemText(i) in to_remove:
+                    combo.removeItem(i)
+        names = [combo.itemText(i) for i in range(1, combo.count())]
+        for item in sorted(to_add):
+            pos = bisect.bisect_left(names, item)
+            names.insert(pos, item)
+            combo.insertItem(pos + 1, item)
+        idx = combo.findText(current)
+        combo.setCurrentIndex(idx if idx != -1 else 0)
+        combo.blockSignals(False)
+        known -= to_remove
+        known |= to_add
+
     def on_team_changed(self, val):
         if val != self.selected_team:
             self.selected_team = val
@@ -550,7 +672,7 @@ class HeatmapWindow(QMainWindow):
             self.update_heatmap()
 
     def rebuild_footsteps(self):
-        self.footsteps = []
+        footstep_parts = []
         self.deaths = []
         for d in self.loaded:
             if not d["enabled"]:
@@ -558,7 +680,9 @@ class HeatmapWindow(QMainWindow):
             parser = d.get("parser")
             if not parser:
                 continue
-            self.footsteps.extend(getattr(parser, "footsteps", []))
+            footsteps = getattr(parser, "footsteps", None)
+            if footsteps is not None and len(footsteps["x"]):
+                footstep_parts.append(footsteps)
             deaths_df = getattr(parser, "player_deaths", None)
             if deaths_df is not None and not deaths_df.empty:
                 self.deaths.append(deaths_df)
@@ -568,31 +692,69 @@ class HeatmapWindow(QMainWindow):
             self.deaths = pd.concat(self.deaths, ignore_index=True)
         else:
             self.deaths = None
-        self.footsteps = self.apply_downsampling(self.footsteps)
+        # Downsampling happens inside the merge, so skipped footsteps are never copied
+        self.footsteps = concat_footsteps(footstep_parts, step=self.downsample_n)
+        self.index_footsteps()
+        self._data_generation += 1
+
+    def index_footsteps(self):
+        """
+        Split self.footsteps into the arrays update_heatmap filters on:
+        float32 fs_x/fs_y, int8 fs_team_codes (TEAM_CODES values) and
+        int16 fs_player_codes, with player_code_map mapping names to codes.
+        """
+        fs = self.footsteps
+        self.fs_x = np.asarray(fs["x"], dtype=np.float32)
+        self.fs_y = np.asarray(fs["y"], dtype=np.float32)
+        team = fs["team"]
+        if hasattr(team, "categories") and list(team.categories) == TEAMS:
+            self.fs_team_codes = np.asarray(team.codes, dtype=np.int8)
+        else:
+            self.fs_team_codes = np.array([TEAM_CODES.get(t, -1) for t in team], dtype=np.int8)
+        self.fs_player_codes, self.player_code_map = _category_codes(fs["player"])
+
+    # Update stages, from cheapest to most expensive
+    UPDATE_COLORS, UPDATE_HEATMAP, UPDATE_REBUILD = range(3)
+
+    def _schedule_update(self, stage):
+        """
+        Run the given update stage once the slider settles; repeated calls restart the timer.
+        """
+        if self._pending_update is None or stage > self._pending_update:
+            self._pending_update = stage
+        self._update_timer.start()
+
+    def _do_update_heatmap(self):
+        stage, self._pending_update = self._pending_update, None
+        if stage == self.UPDATE_REBUILD:
+            self.rebuild_footsteps()
+            self.update_heatmap()
+            self.update_info()
+            self.update_player_team_selectors()
+        elif stage == self.UPDATE_HEATMAP:
+            self.update_heatmap()
+        elif stage == self.UPDATE_COLORS:
+            self.refresh_heatmap_colors()
 
     def on_sigma_changed(self, val):
         self.cur_sigma = val
-        self.update_heatmap()
+        self._schedule_update(self.UPDATE_HEATMAP)
 
     def on_brightness_changed(self, val):
         self.heatmap_brightness = val
-        self.update_heatmap()
+        self._schedule_update(self.UPDATE_COLORS)
 
     def on_contrast_changed(self, val):
         self.heatmap_contrast = val
-        self.update_heatmap()
+        self._schedule_update(self.UPDATE_COLORS)
 
     def on_cmap_changed(self, text):
         self.cur_colormap = text
-        self.update_heatmap()
+        self.refresh_heatmap_colors()
 
     def on_downsample_n_changed(self, val):
         self.downsample_n = int(val)
-        self.rebuild_footsteps()
-        self.update_heatmap()
-        self.update_info()
-        self.update_player_team_selectors()
+        self._schedule_update(self.UPDATE_REBUILD)
 
     def save_view(self):
-        saver = RadarImageSaver(self)
-        saver.save_radar_image(self.scene, self.map_name)
+        self.radar_saver.save_radar_image(self.scene, self.map_name)